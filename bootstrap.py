@@ -1,3 +1,5 @@
+import asyncio
+import errno
 import time
 
 from socket_class import SocketManager
@@ -11,67 +13,205 @@ class BootStrap:
     """
     DEFAULT_BOOTSTRAP_NODE = "127.0.0.1:5000"
     REFRESH_RATE = 100
-    node_list = []
+    PROBE_TIMEOUT = 5
+    # Bound on probes in flight at once, each holds a socket open.
+    MAX_CONCURRENT_PROBES = 64
+    # Errors raised when this host runs out of sockets, which say nothing about the node being probed.
+    LOCAL_RESOURCE_ERRORS = (errno.EMFILE, errno.ENFILE)
+    # Number of nodes returned when a connect request does not say how many it wants.
+    DEFAULT_NUM_CONNECTIONS = 8
+    __slots__ = ("port", "node_list", "node_hosts", "node_ports", "node_index", "socket_manager",
+                 "__lock", "__stop", "__random", "__alive_message", "__handlers")
+    NODES_REPLY_PREFIX = "nodes" + SocketManager.MESSAGE_SEPARATOR_PATTERN
 
-    def __init__(self, bootstrap_address_string=DEFAULT_BOOTSTRAP_NODE):
+    def __init__(self, bootstrap_address_string=DEFAULT_BOOTSTRAP_NODE, seed=None):
+        """
+        Args:
+            bootstrap_address_string(str): Address to listen on in the form "IP:PORT".
+            seed: Optional seed for the node selection, seeded once from system entropy if None.
+        """
         address = bootstrap_address_string.split(":")
         ip = address[0]
         port = int(address[1])
+        self.port = port
+        self.node_list = []
+        self.node_hosts = []
+        self.node_ports = []
+        self.node_index = {}
+        # Guards the node registry, which is shared by connection threads and the dead connection sweep.
+        self.__lock = threading.RLock()
+        self.__stop = threading.Event()
         self.socket_manager = SocketManager(self, ip=ip, port=port)
+        self.__random = random.Random(seed)
+        # The liveness probe never changes, so it is formatted once rather than per probe.
+        self.__alive_message = "alive?" + SocketManager.MESSAGE_SEPARATOR_PATTERN + str(port)
+        # Commands are dispatched through a table built once rather than a chain of string comparisons.
+        self.__handlers = {
+            "connect": self.__connect,
+            "client connect": self.__connect
+        }
 
     def start_server(self):
+        self.__stop.clear()
         self.run()
         threading.Thread(target=self.__check_for_dead_connections).start()
 
     def __check_for_dead_connections(self):
-        while SocketManager.run:
-            time.sleep(BootStrap.REFRESH_RATE)
+        # Sweeps are scheduled against a monotonic deadline so their own duration does not push the next one back,
+        # and waiting on the stop event lets shutdown interrupt the wait instead of sleeping it out.
+        stop = self.__stop
+        lock = self.__lock
+        monotonic = time.monotonic
+        deadline = monotonic()
+        while not stop.is_set():
+            deadline += BootStrap.REFRESH_RATE
+            if stop.wait(max(0.0, deadline - monotonic())):
+                break
             print("Checking for dead connections...")
-            for address in BootStrap.node_list:
-                address_details = address.split(":")
-                response = self.socket_manager.send_message(address_details[0], int(address_details[1]), "alive?")
-                if response != "True":
-                    print("Node: %s found dead, removing...")
-                    BootStrap.node_list.remove(address)
+            with lock:
+                peers = self.node_list.copy()
+                hosts = self.node_hosts.copy()
+                ports = self.node_ports.copy()
+            if len(peers) == 0:
+                continue
+            # Probe every peer concurrently without holding the lock, then remove the dead ones in a single pass.
+            results = asyncio.run(self.__probe_all(hosts, ports, peers))
+            with lock:
+                for address, alive in results:
+                    if alive is False:
+                        print("Node: %s found dead, removing..." % address)
+                        self.__remove_node(address)
+
+    async def __probe_all(self, hosts, ports, addresses):
+        """
+        Probes all given nodes on a single event loop, at most MAX_CONCURRENT_PROBES at a time.
+
+        Returns:
+            list[tuple]: The address of each node probed and whether it responded.
+        """
+        semaphore = asyncio.Semaphore(BootStrap.MAX_CONCURRENT_PROBES)
+        return await asyncio.gather(*[self.__probe(semaphore, host, port, address)
+                                      for host, port, address in zip(hosts, ports, addresses)])
+
+    async def __probe(self, semaphore, host, port, address):
+        """
+        Asks a node whether it is still alive, giving up after PROBE_TIMEOUT seconds.
+
+        Args:
+            semaphore(asyncio.Semaphore): Limits the number of probes in flight.
+            host(str): IP address of the node.
+            port(int): Port number of the node.
+            address(str): Address of the node in the form "IP:PORT".
+
+        Returns:
+            tuple: The address probed and True if the node responded, False if it did not, or None if this host
+                could not open a socket to ask.
+        """
+        async with semaphore:
+            try:
+                response = await asyncio.wait_for(self.__exchange(host, port, self.__alive_message),
+                                                  BootStrap.PROBE_TIMEOUT)
+            except asyncio.TimeoutError:
+                response = None
+            except OSError as error:
+                if error.errno in BootStrap.LOCAL_RESOURCE_ERRORS:
+                    return address, None
+                response = None
+        return address, response == "True"
+
+    @staticmethod
+    async def __exchange(host, port, message):
+        """
+        Sends a single message to a node and returns its reply.
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(SocketManager.encode_frame(message))
+            await writer.drain()
+            header = await reader.readexactly(SocketManager.FRAME_HEADER.size)
+            response = await reader.readexactly(SocketManager.FRAME_HEADER.unpack(header)[0])
+        except asyncio.IncompleteReadError:
+            return ""
+        finally:
+            writer.close()
+        return response.decode()
 
     def stop_server(self):
+        self.__stop.set()
         self.socket_manager.stop_server()
 
     def run(self):
         self.socket_manager.listen()
 
     def got_message(self, address, message):
-        ret_message = "None"
-        message_csv = message.split(SocketManager.MESSAGE_SEPARATOR_PATTERN)
-        if message_csv[0] == "connect" or message_csv[0] == "client connect":
+        message_csv = message.split(SocketManager.MESSAGE_SEPARATOR_PATTERN, 2)
+        handler = self.__handlers.get(message_csv[0])
+        if handler is None:
+            return "None"
+        return handler(address, message_csv)
+
+    def __connect(self, address, message_csv):
+        """
+        Handles a "connect" or "client connect" request, replying with a selection of known nodes.
+
+        Args:
+            address: The address of the sender.
+            message_csv(list[str]): The request split into command, listening port and optionally the number of
+                connections, which defaults to DEFAULT_NUM_CONNECTIONS.
+
+        Returns:
+            str: "nodes" followed by the selected node addresses, separated by the message separator, or "None" if
+                the request carries no valid port.
+        """
+        if len(message_csv) < 2 or not message_csv[1].isdigit():
+            return "None"
+        separator = SocketManager.MESSAGE_SEPARATOR_PATTERN
+        if len(message_csv) > 2 and message_csv[2].isdigit():
             num_connections = int(message_csv[2])
-            if len(BootStrap.node_list) <= num_connections:
-                connection_list = BootStrap.node_list.copy()
-            else:
-                random.seed()
-                index = random.randint(0, len(BootStrap.node_list))
-                connection_list = []
-                skip = 0
-                for i in range(0, num_connections):
-                    selected_node_index = (index + skip + i) % len(BootStrap.node_list)
-                    if BootStrap.node_list[selected_node_index] != "127.0.0.1:%s" % message[1]:
-                        connection_list.append(BootStrap.node_list[selected_node_index])
-                    else:
-                        skip += 1
-                        i -= 1
-                        if skip > 5:
-                            break
-            ret_message = "nodes"
-            for details in connection_list:
-                ret_message += SocketManager.MESSAGE_SEPARATOR_PATTERN + str(details)
-            address_string = str(address[0]) + ":" + str(message_csv[1])
-            if address_string not in BootStrap.node_list and message_csv != "client connect":
-                BootStrap.node_list.append(address_string)
-                print("New connection from: %s" % str(address_string))
-        return ret_message
+        else:
+            num_connections = BootStrap.DEFAULT_NUM_CONNECTIONS
+        host = str(address[0])
+        port = message_csv[1]
+        address_string = host + ":" + port
+        with self.__lock:
+            # Never hand a node its own address, then draw the whole batch in one call.
+            candidates = [node for node in self.node_list if node != address_string]
+            connection_list = self.__random.sample(candidates, min(num_connections, len(candidates)))
+            if address_string not in self.node_index and message_csv[0] != "client connect":
+                self.__add_node(host, int(port), address_string)
+                print("New connection from: %s" % address_string)
+        if not connection_list:
+            return "nodes"
+        return BootStrap.NODES_REPLY_PREFIX + separator.join(connection_list)
+
+    def __add_node(self, host, port, address_string):
+        """
+        Appends a node to the node list and records its position for constant time lookup and removal.
+        The host and port are stored pre-parsed so the dead connection sweep never has to split addresses.
+        Caller must hold the lock.
+        """
+        self.node_index[address_string] = len(self.node_list)
+        self.node_list.append(address_string)
+        self.node_hosts.append(host)
+        self.node_ports.append(port)
+
+    def __remove_node(self, address_string):
+        """
+        Removes a node by swapping it with the last node in the list and popping, avoiding a linear list.remove().
+        Caller must hold the lock.
+        """
+        index = self.node_index.pop(address_string, None)
+        if index is None:
+            return
+        last_address = self.node_list.pop()
+        last_host = self.node_hosts.pop()
+        last_port = self.node_ports.pop()
+        if index < len(self.node_list):
+            self.node_list[index] = last_address
+            self.node_hosts[index] = last_host
+            self.node_ports[index] = last_port
+            self.node_index[last_address] = index
 
     def get_node_list(self):
-        ret_message = ""
-        for node in BootStrap.node_list:
-            ret_message += str(node) + "\n"
-        return ret_message
+        with self.__lock:
+            return "".join(str(node) + "\n" for node in self.node_list)
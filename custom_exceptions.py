@@ -1,7 +1,6 @@
-
 class NoNonceException(ValueError):
+    DEFAULT_MESSAGE = "No nonce provided, cannot hash block!"
+    __slots__ = ()
 
-    def __init__(self, message=None):
-        self.strerror = message
-        if message is None:
-            self.strerror = "No nonce provided, cannot hash block!"
+    def __init__(self, message=DEFAULT_MESSAGE):
+        super().__init__(message)
@@ -16,7 +16,10 @@ Optional if not running UI.
         - python3 minicoin.py --type node --port 5010 --print
 """
 import getopt
+import multiprocessing
+import os
 import sys
+from concurrent.futures import as_completed, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
 from concurrent.futures.thread import ThreadPoolExecutor
 import time
 from hashlib import sha3_256
@@ -24,34 +27,33 @@ from custom_exceptions import NoNonceException
 from socket_class import SocketManager
 import random
 import threading
+from dataclasses import dataclass, field
 from bootstrap import BootStrap
 from genesis_block import GenesisBlock
 
 
+@dataclass(frozen=True, slots=True)
 class Transaction:
     """
-    Class to act as a single transaction.
-    """
+    Class to act as a single transaction, oversimplification of transactions represented as strings and IDs.
+    Transactions never change once created, so they are frozen and slotted to keep the many held by the ledger and
+    mem pool small.
 
-    def __init__(self, tx_id, tx_data):
-        """
-        Initialize a simple transaction, oversimplification of transactions represented as strings and IDs.
+    Attributes:
+        tx_id(str): The UID of a Transaction represented as a hash of the data.
+        tx_data(str): Simplified transaction represented as a string.
+    """
+    tx_id: str
+    tx_data: str
+    # The string form is used for every block built from and every announcement of a transaction, so it is formatted
+    # once. Transactions are frozen, so it can never go stale.
+    __string: str = field(init=False, repr=False, compare=False)
 
-        Args:
-            tx_id(str): The UID of a Transaction represented as a hash of the data.
-            tx_data(str): Simplified transaction represented as a string.
-        """
-        self.tx_id = tx_id
-        self.tx_data = tx_data
+    def __post_init__(self):
+        object.__setattr__(self, "_Transaction__string", "%s, %s" % (self.tx_id, self.tx_data))
 
     def __str__(self):
-        return "%s, %s" % (str(self.tx_id), str(self.tx_data))
-
-    def __eq__(self, other):
-        if type(other) == type(self):
-            if self.tx_id == other.tx_id and self.tx_data == other.tx_data:
-                return True
-        return False
+        return self.__string
 
     @staticmethod
     def transaction_from_string(transaction_string):
@@ -64,9 +66,27 @@ class Transaction:
 
 class MemPool:
     """
-    Pool of unconfirmed transactions.
+    Pool of unconfirmed transactions, keyed by transaction ID. Dicts keep insertion order, so the first key is always
+    the oldest transaction.
+
+    Notes:
+        The mem pool is safe to share between threads. IDs of transactions already pooled or confirmed are
+        remembered, so repeat announcements of a transaction are turned away without taking the lock.
+        Pooled transactions are also held in a list alongside their positions in it, so a random sample can be drawn
+        without copying the whole pool.
     """
-    tx = []
+    # Bound on pooled transactions, the oldest is evicted to make room for a new one.
+    MEMPOOL_MAX = 100000
+    # Bound on remembered transaction IDs, the oldest is forgotten first.
+    SEEN_MAX = MEMPOOL_MAX * 2
+
+    def __init__(self):
+        self.tx = {}
+        self.__transactions = []
+        self.__positions = {}
+        # Used as an insertion ordered set.
+        self.__seen = {}
+        self.__lock = threading.Lock()
 
     def get_n_tx(self, number):
         """
@@ -79,59 +99,94 @@ class MemPool:
             list[Transaction]: A list of transactions equal to to number requested, if not enough transactions
                 exist, return the entire list.
         """
-        if number >= len(self.tx):
-            return self.tx.copy()
-        return_tx = []
-        random.seed()
-        while len(return_tx) < number:
-            transaction = random.choice(self.tx)
-            if transaction not in return_tx:
-                return_tx.append(transaction)
-        return return_tx
+        with self.__lock:
+            if number >= len(self.__transactions):
+                return list(self.__transactions)
+            return random.sample(self.__transactions, number)
+
+    def get_all_tx(self):
+        """
+        Returns:
+            list[Transaction]: A snapshot of every transaction in the mem pool.
+        """
+        with self.__lock:
+            return list(self.tx.values())
 
     def add_tx(self, tx):
         """
-        Adds a list of transactions to the mem pool, supports single transactions.
+        Adds transactions to the mem pool.
+
         Args:
-            tx: List of Transactions.
+            tx: Iterable of Transactions, wrap a single transaction in a tuple.
 
+        Returns:
+            bool: True if any of the transactions were new to the mem pool.
         """
         transaction_is_new = False
-        if type(tx) is Transaction:
-            tx_list = [tx]
-        elif type(tx) is list:
-            tx_list = tx
-        else:
-            return transaction_is_new
-        for transaction in tx_list:
-            if transaction not in self.tx:
-                self.tx.append(transaction)
-                transaction_is_new = True
+        seen = self.__seen
+        for transaction in tx:
+            # A single dict lookup is atomic, so known transactions are dropped before contending for the lock.
+            if transaction.tx_id in seen:
+                continue
+            with self.__lock:
+                # Still pooled transactions can age out of the bounded seen set, so the pool is checked as well.
+                if transaction.tx_id in seen or transaction.tx_id in self.tx:
+                    continue
+                self.__remember(transaction.tx_id)
+                if len(self.tx) >= MemPool.MEMPOOL_MAX:
+                    self.__discard(next(iter(self.tx)))
+                self.tx[transaction.tx_id] = transaction
+                self.__positions[transaction.tx_id] = len(self.__transactions)
+                self.__transactions.append(transaction)
+            transaction_is_new = True
         return transaction_is_new
 
     def purge_confirmed_tx(self, tx):
         """
-        Removes a list of transactions from the mem pool, supports single transactions.
+        Removes transactions from the mem pool.
 
         Args:
-            tx: List of Transactions.
+            tx: Iterable of Transactions, wrap a single transaction in a tuple.
+        """
+        with self.__lock:
+            for transaction in tx:
+                self.__discard(transaction.tx_id)
+                # Confirmed transactions are remembered so a late announcement does not return them to the pool.
+                if transaction.tx_id not in self.__seen:
+                    self.__remember(transaction.tx_id)
 
+    def __discard(self, tx_id):
         """
-        if type(tx) is Transaction:
-            tx_list = [tx]
-        elif type(tx) is list:
-            tx_list = tx
-        else:
-            return False
-        for transaction in tx_list:
-            if transaction in self.tx:
-                self.tx.remove(transaction)
+        Removes a transaction from the pool if present, moving the last listed transaction into its place so removal
+        does not shift the list. Caller must hold the lock.
+        """
+        if self.tx.pop(tx_id, None) is None:
+            return
+        position = self.__positions.pop(tx_id)
+        last = self.__transactions.pop()
+        if position < len(self.__transactions):
+            self.__transactions[position] = last
+            self.__positions[last.tx_id] = position
+
+    def __remember(self, tx_id):
+        """
+        Records a transaction ID as seen, forgetting the oldest once SEEN_MAX IDs are held. Caller must hold the lock.
+        """
+        if len(self.__seen) >= MemPool.SEEN_MAX:
+            del self.__seen[next(iter(self.__seen))]
+        self.__seen[tx_id] = None
 
 
 class Ledger:
     """
     The block chain.
+
+    Notes:
+        A ledger is serialized as "LEDGER:" followed by each block as its length, a colon and the block string, so
+        parsing walks the string once and block contents can never be mistaken for the boundary between blocks.
+        Only the parser is protected, a ledger sent to a peer relies on its reply being passed on unsplit.
     """
+    SERIALIZED_HEADER = "LEDGER:"
 
     def __init__(self):
         self.block_chain = []
@@ -139,6 +194,28 @@ class Ledger:
                                       [Transaction(GenesisBlock.genesis_transaction_id,
                                                    GenesisBlock.genesis_transaction_string)],
                                       GenesisBlock.previous_block_hash, GenesisBlock.nonce))
+        self.__summary = None
+        self.__epoch = 0
+        self.__update_summary()
+
+    def __update_summary(self):
+        """
+        Caches the length, head hash and genesis hash of the chain. They are replaced together in a single assignment
+        so readers always see a consistent set without taking a lock. Also advances the epoch, as every call follows
+        a change to the chain.
+        """
+        self.__summary = (len(self.block_chain), self.block_chain[-1].block_hash, self.block_chain[0].block_hash)
+        self.__epoch += 1
+
+    def get_epoch(self):
+        """
+        A counter advanced every time the chain changes, so a reader can tell whether the chain has moved on since it
+        last looked with a single read.
+
+        Returns:
+            int: The current epoch of the ledger.
+        """
+        return self.__epoch
 
     def size(self):
         """
@@ -147,7 +224,16 @@ class Ledger:
         Returns:
             int: Length of the blockchain.
         """
-        return len(self.block_chain)
+        return self.__summary[0]
+
+    def get_summary(self):
+        """
+        Get the cached summary of the ledger.
+
+        Returns:
+            tuple: The length of the blockchain, the hash of the head block and the hash of the genesis block.
+        """
+        return self.__summary
 
     def get_last_block(self):
         """
@@ -167,6 +253,7 @@ class Ledger:
         """
         if block.block_id == len(self.block_chain):
             self.block_chain.append(block)
+            self.__update_summary()
 
     def get_genesis_block(self):
         """
@@ -178,29 +265,53 @@ class Ledger:
         return self.block_chain[0]
 
     def __str__(self):
-        return_string = "LEDGER:"
-        for block in self.block_chain:
-            return_string += "BLOCK:" + str(block)
-        return_string += "BLOCK:LEDGER:"
-        return return_string
+        return self.serialize_from(0)
+
+    def serialize_from(self, start_height):
+        """
+        Serializes the blocks from a given height onwards, in the same format as str(ledger).
+
+        Args:
+            start_height(int): ID of the first block to include.
+
+        Returns:
+            str: The blocks from start_height to the head, readable by ledger_from_string.
+        """
+        block_strings = [str(block) for block in self.block_chain[start_height:]]
+        return Ledger.SERIALIZED_HEADER + "".join("%d:%s" % (len(block_string), block_string)
+                                                  for block_string in block_strings)
 
     @staticmethod
     def ledger_from_string(ledger_string):
         """
         Builds a ledger from its string representation.
+
+        Returns:
+            list[Block]: The blocks of the ledger, or an empty list if the string is malformed or truncated.
         """
-        if type(ledger_string) == list:
-            ledger_string = ledger_string[0]
+        if not ledger_string.startswith(Ledger.SERIALIZED_HEADER):
+            return []
         ledger_list = []
-        ledger_array = ledger_string.split("BLOCK:")
-        if ledger_array[0] == "LEDGER:" and ledger_array[-1] == "LEDGER:":
-            for block in ledger_array[1:-1]:
-                ledger_list.append(Block.block_from_string(block))
-        return ledger_list.copy()
+        position = len(Ledger.SERIALIZED_HEADER)
+        end_of_ledger = len(ledger_string)
+        while position < end_of_ledger:
+            separator = ledger_string.find(":", position)
+            length = ledger_string[position:separator]
+            if separator == -1 or not length.isdigit():
+                return []
+            position = separator + 1 + int(length)
+            if position > end_of_ledger:
+                return []
+            try:
+                ledger_list.append(Block.block_from_string(ledger_string[separator + 1:position]))
+            except (IndexError, ValueError):
+                return []
+        return ledger_list
 
     def replace_blockchain(self, block_chain):
         if len(block_chain) > len(self.block_chain):
             self.block_chain = block_chain.copy()
+            self.__update_summary()
 
 
 class Block:
@@ -208,6 +319,8 @@ class Block:
     Class to represent one block, used for both the Ledger and for Mining.
     """
     TRANSACTIONS_PER_BLOCK = 10
+    __slots__ = ("block_id", "previous_block_hash", "tx", "block_hash", "nonce",
+                 "__string_parts", "__encoded_parts", "__canonical", "__digest")
 
     def __init__(self, block_id, tx, previous_block_hash, nonce=None):
         """
@@ -217,7 +330,8 @@ class Block:
             block_id(int): Block number in chain.
             tx(list[Transaction]): List of transactions in block.
             previous_block_hash(str): Hex digest hash of the previous block in chain.
-            nonce(float): The nonce for this blocks hash problem.
+            nonce(int): The nonce for this blocks hash problem, the genesis block predates integer nonces and uses
+                a float.
         """
         self.block_id = block_id
         self.previous_block_hash = previous_block_hash
@@ -227,6 +341,10 @@ class Block:
             self.tx = [tx]
         self.block_hash = None
         self.nonce = nonce
+        self.__string_parts = None
+        self.__encoded_parts = None
+        self.__canonical = None
+        self.__digest = None
         if self.nonce is not None:
             self.block_hash = HashFunctions.hash_input(self)
 
@@ -242,12 +360,80 @@ class Block:
             NoNonceException: Custom exception raised when block has no 'nonce' to prevent invalid blocks being hashed.
         """
 
-        if self.nonce is None:
+        return self.__get_canonical()[1]
+
+    def canonical_bytes(self):
+        """
+        The encoded block string, as hashed and as sent to peers.
+
+        Returns:
+            bytes: The UTF-8 encoding of str(block).
+
+        Raises:
+            NoNonceException: Custom exception raised when block has no 'nonce' to prevent invalid blocks being hashed.
+        """
+        return self.__get_canonical()[2]
+
+    def digest(self):
+        """
+        The raw SHA3-256 digest of the block, computed once per nonce so that a received block is hashed once for
+        both its block_hash and its validation.
+
+        Returns:
+            bytes: The digest of canonical_bytes().
+
+        Raises:
+            NoNonceException: Custom exception raised when block has no 'nonce' to prevent invalid blocks being hashed.
+        """
+        nonce = self.nonce
+        if self.__digest is None or self.__digest[0] is not nonce:
+            self.__digest = (nonce, sha3_256(self.canonical_bytes()).digest())
+        return self.__digest[1]
+
+    def __get_canonical(self):
+        """
+        Builds the block string and its encoding once per nonce. A minted block is hashed, validated and propagated
+        without being rebuilt each time, while a new nonce (set by the miner) still invalidates the cache.
+
+        Returns:
+            tuple: The nonce the cache was built for, the block string and its encoding.
+        """
+        nonce = self.nonce
+        if nonce is None:
             raise NoNonceException()
-        return_string = "%s\n%s\n%s" % (str(self.block_id), str(self.nonce), str(self.previous_block_hash))
-        for transaction in self.tx:
-            return_string += "\n%s" % str(transaction)
-        return return_string
+        # Identity rather than equality, 1 and 1.0 are equal but serialize differently. The cache keeps the nonce
+        # alive so its identity cannot be reused by another object.
+        if self.__canonical is None or self.__canonical[0] is not nonce:
+            prefix, suffix = self.__get_string_parts()
+            string = prefix + str(nonce) + suffix
+            self.__canonical = (nonce, string, string.encode())
+        return self.__canonical
+
+    def __get_string_parts(self):
+        """
+        The block string split around the nonce, built once as nothing but the nonce changes after creation.
+
+        Returns:
+            tuple: The block string before the nonce and the block string after the nonce.
+        """
+        if self.__string_parts is None:
+            prefix = "%s\n" % str(self.block_id)
+            suffix = "\n%s" % str(self.previous_block_hash) \
+                     + "".join("\n%s" % str(transaction) for transaction in self.tx)
+            self.__string_parts = (prefix, suffix)
+        return self.__string_parts
+
+    def get_encoded_parts(self):
+        """
+        Encoded form of the block string either side of the nonce, so a miner need only encode each new nonce.
+
+        Returns:
+            tuple: Bytes preceding the nonce and bytes following the nonce in the string used for hashing.
+        """
+        if self.__encoded_parts is None:
+            prefix, suffix = self.__get_string_parts()
+            self.__encoded_parts = (prefix.encode(), suffix.encode())
+        return self.__encoded_parts
 
     def to_string(self):
         """
@@ -280,7 +466,8 @@ class Block:
         for transaction in parameters[3:]:
             tx_data = transaction.split(", ")
             tx_list.append(Transaction(tx_data[0], tx_data[1]))
-        reconstructed_block = Block(int(parameters[0]), tx_list, parameters[2], nonce=float(parameters[1]))
+        nonce = int(parameters[1]) if parameters[1].isdigit() else float(parameters[1])
+        reconstructed_block = Block(int(parameters[0]), tx_list, parameters[2], nonce=nonce)
         return reconstructed_block
 
 
@@ -297,14 +484,58 @@ class HashFunctions:
         Returns the hash of any object that responds to the __str__ function.
 
         Args:
-            hash_me: The object to be hashed.
+            hash_me: The object to be hashed, already serialized bytes are hashed as is.
 
         Returns:
             str: The hex digest of the hash of the given item.
         """
+        if isinstance(hash_me, Block):
+            return hash_me.digest().hex()
+        if isinstance(hash_me, (bytes, bytearray)):
+            return sha3_256(hash_me).hexdigest()
         hashed = sha3_256(str(hash_me).encode())
         return hashed.hexdigest()
 
+    @staticmethod
+    def hash_input_bytes(hash_me):
+        """
+        Returns the raw digest of any object that responds to the __str__ function.
+
+        Args:
+            hash_me: The object to be hashed, already serialized bytes are hashed as is.
+
+        Returns:
+            bytes: The digest of the hash of the given item.
+        """
+        if isinstance(hash_me, Block):
+            return hash_me.digest()
+        if isinstance(hash_me, (bytes, bytearray)):
+            return sha3_256(hash_me).digest()
+        return sha3_256(str(hash_me).encode()).digest()
+
+    @staticmethod
+    def search_nonces(prefix, suffix, nonces, pattern):
+        """
+        Tries a batch of nonces against a block whose serialized form has been split around its nonce.
+
+        Args:
+            prefix(bytes): Encoded block string preceding the nonce.
+            suffix(bytes): Encoded block string following the nonce.
+            nonces: Iterable of nonces to try.
+            pattern(bytes): Raw bytes the digest must begin with.
+
+        Returns:
+            tuple: The first (nonce, hex digest) whose hash begins with pattern, or None if no nonce in the batch does.
+        """
+        # Bind the hash constructor locally, this loop runs once per nonce. The raw digest is compared so the hex
+        # string is only built for the winning nonce.
+        hasher = sha3_256
+        for nonce in nonces:
+            digest = hasher(prefix + str(nonce).encode() + suffix).digest()
+            if digest.startswith(pattern):
+                return nonce, digest.hex()
+        return None
+
 
 class MiniCoin:
     """
@@ -313,16 +544,41 @@ class MiniCoin:
 
     DEFAULT_BOOTSTRAP_NODE = "127.0.0.1:5000"
     HASH_PATTERN = "00ff00"
+    HASH_PATTERN_BYTES = bytes.fromhex(HASH_PATTERN)
+    # Nonces tried by each mining process between each check of the mining flags.
+    MINING_BATCH_SIZE = 4096
+    # Hashing is CPU bound and threads would be serialized by the GIL, so nonces are searched in this many processes.
+    MINING_PROCESSES = os.cpu_count() or 1
     MAX_CONNECTIONS = 5
     REFRESH_RATE = 45
-    shutdown = False
-    active_mining = False
+    # Seconds either side of REFRESH_RATE each sync is randomly moved by, so nodes started together drift apart.
+    REFRESH_JITTER = 5
+    # Seconds to wait on peers answering a ledger check before giving up on them.
+    SYNC_TIMEOUT = 10
+    # Commands understood by nodes, sent as the first field of every message.
+    NEW_BLOCK = "new block"
+    NEW_TRANSACTION = "new transaction"
+    CHECK_LEDGER = "check ledger"
+    SEND_LEDGER = "send ledger"
+    GET_BLOCKS_FROM = "get blocks from"
+    PRETTY_PRINT = "pretty print"
+    ALIVE = "alive?"
+    CONNECT = "connect"
+    # Set when the node stops, waiting on it rather than sleeping lets background threads exit at once.
+    shutdown_event = threading.Event()
+    # Set to stop the miner, waiting on it between blocks lets a stop request take effect at once.
+    stop_mining = threading.Event()
     ledger_sync = True
     no_new_block = False
     ledger = Ledger()
     mem_pool = MemPool()
     peers = []
-    semaphore = threading.Semaphore()
+    # Each shared structure has its own lock so that mining, propagation and transaction handling do not serialize
+    # on one another, the mem pool locks internally. The boolean flags are plain attributes, assigning them is atomic.
+    ledger_lock = threading.RLock()
+    peers_lock = threading.Lock()
+    # Outgoing peer messages are sent from a shared pool rather than a new thread per message.
+    peer_executor = ThreadPoolExecutor(max_workers=MAX_CONNECTIONS * 2, thread_name_prefix="peer")
     verbose = True
 
     def __init__(self, port, verbose=True):
@@ -330,6 +586,17 @@ class MiniCoin:
         self.address_string = "127.0.0.1:%s" % str(port)
         self.socket_manager = SocketManager(self, port=int(port))
         MiniCoin.verbose = verbose
+        # Each handler is given the payload following the command and port, got_message answers "COMPLETE" for a
+        # handler that returns None.
+        self.__handlers = {
+            MiniCoin.NEW_BLOCK: self.__handle_new_block,
+            MiniCoin.NEW_TRANSACTION: self.__handle_new_transaction,
+            MiniCoin.CHECK_LEDGER: lambda payload: self.check_ledger(),
+            MiniCoin.SEND_LEDGER: lambda payload: self.send_ledger(),
+            MiniCoin.GET_BLOCKS_FROM: self.send_blocks_from,
+            MiniCoin.PRETTY_PRINT: lambda payload: self.pretty_print(),
+            MiniCoin.ALIVE: lambda payload: True
+        }
 
     def get_peers_from_bootstrap(self, connection_string=DEFAULT_BOOTSTRAP_NODE, connection_quantity=MAX_CONNECTIONS):
         """
@@ -337,13 +604,13 @@ class MiniCoin:
         """
         if MiniCoin.verbose:
             print("\nQuerying bootstrap for peers...\n")
-        peers = self.send_message(connection_string, "connect", str(connection_quantity))
-        if peers[0] == "nodes" and type(peers) == list and len(peers) > 1:
-            for address in peers[1:]:
-                MiniCoin.semaphore.acquire()
-                if address != self.address_string and address not in MiniCoin.peers:
-                    MiniCoin.peers.append(address)
-                MiniCoin.semaphore.release()
+        peers = self.send_message(connection_string, MiniCoin.CONNECT, str(connection_quantity)) \
+            .split(SocketManager.MESSAGE_SEPARATOR_PATTERN)
+        if peers[0] == "nodes" and len(peers) > 1:
+            with MiniCoin.peers_lock:
+                for address in peers[1:]:
+                    if address != self.address_string and address not in MiniCoin.peers:
+                        MiniCoin.peers.append(address)
 
     def start_server(self):
         """
@@ -353,22 +620,23 @@ class MiniCoin:
         self.get_peers_from_bootstrap()
         self.socket_manager.listen()
         self.sync_ledger()
-        MiniCoin.shutdown = False
+        MiniCoin.shutdown_event.clear()
         threading.Thread(target=self.__threaded_sync_ledger).start()
 
     def __threaded_sync_ledger(self):
         """
         Helper function for looping a thread which will ensure the ledger remains in sync with other nodes.
         """
-        while not MiniCoin.shutdown:
-            time.sleep(MiniCoin.REFRESH_RATE)
+        while not MiniCoin.shutdown_event.wait(MiniCoin.REFRESH_RATE
+                                               + random.uniform(-MiniCoin.REFRESH_JITTER, MiniCoin.REFRESH_JITTER)):
             self.sync_ledger()
 
     def stop_server(self):
-        MiniCoin.shutdown = True
+        MiniCoin.shutdown_event.set()
+        MiniCoin.stop_mining.set()
         self.socket_manager.stop_server()
 
-    def send_message(self, address_string, command, message=""):
+    def send_message(self, address_string, command, message="", timeout=None):
         """
         Helper function to easily format and send messages over sockets.
 
@@ -376,22 +644,23 @@ class MiniCoin:
             address_string(str): String representation of the target node in form of "IP:PORT"
             command(str): The message string that identifies the reason for contacting the node.
             message(str): The data to accompany the request being sent.
+            timeout(float): Seconds to wait on the target before giving up, defaults to the socket idle timeout.
 
         Returns:
-            str: The response from the target.
+            str: The response from the target, unsplit as a payload such as a ledger may contain the separator.
         """
         address = address_string.split(":")
         separated_message = str(command) + SocketManager.MESSAGE_SEPARATOR_PATTERN + str(self.port) \
                             + SocketManager.MESSAGE_SEPARATOR_PATTERN + str(message)
-        response = self.socket_manager.send_message(address[0], int(address[1]), separated_message)
+        response = self.socket_manager.send_message(address[0], int(address[1]), separated_message, timeout)
         if response == "CONNECTION ERROR":
-            MiniCoin.semaphore.acquire()
-            if "%s:%s" % (address[0], str(address[1])) in MiniCoin.peers:
-                MiniCoin.peers.remove("%s:%s" % (address[0], str(address[1])))
-            MiniCoin.semaphore.release()
-        if len(MiniCoin.peers) == 0 and command != "connect":
+            with MiniCoin.peers_lock:
+                if "%s:%s" % (address[0], str(address[1])) in MiniCoin.peers:
+                    MiniCoin.peers.remove("%s:%s" % (address[0], str(address[1])))
+            self.socket_manager.close_connections(address[0], address[1])
+        if len(MiniCoin.peers) == 0 and command != MiniCoin.CONNECT:
             self.get_peers_from_bootstrap()
-        return response.split(SocketManager.MESSAGE_SEPARATOR_PATTERN)
+        return response
 
     def got_message(self, address, message):
         """
@@ -406,32 +675,43 @@ class MiniCoin:
 
         Notes:
             Valid messages begin with one of the following strings before the first separator.
-                - "new block"
-                - "new transaction"
-                - "send ledger"
-                - "check ledger"
-                - "pretty print"
-                - "alive?"
-        """
-        parsed_message = message.split(SocketManager.MESSAGE_SEPARATOR_PATTERN)
-        if "127.0.0.1:%s" % parsed_message[1] not in MiniCoin.peers and len(MiniCoin.peers) < MiniCoin.MAX_CONNECTIONS \
-                and "127.0.0.1:%s" % parsed_message[1] != self.address_string and parsed_message[0] != "alive?":
-            MiniCoin.semaphore.acquire()
-            MiniCoin.peers.append("127.0.0.1:%s" % parsed_message[1])
-            MiniCoin.semaphore.release()
-        if parsed_message[0] == "new block":
-            self.__got_new_block(Block.block_from_string(parsed_message[2]))
-        elif parsed_message[0] == "new transaction":
-            self._got_new_transaction(Transaction.transaction_from_string(parsed_message[2]))
-        elif parsed_message[0] == "check ledger":
-            return self.check_ledger()
-        elif parsed_message[0] == "send ledger":
-            return self.send_ledger()
-        elif parsed_message[0] == "pretty print":
-            self.pretty_print()
-        elif parsed_message[0] == "alive?":
-            return True
-        return "COMPLETE"
+                - NEW_BLOCK: "new block"
+                - NEW_TRANSACTION: "new transaction"
+                - SEND_LEDGER: "send ledger"
+                - GET_BLOCKS_FROM: "get blocks from"
+                - CHECK_LEDGER: "check ledger"
+                - PRETTY_PRINT: "pretty print"
+                - ALIVE: "alive?"
+        """
+        # Split off the command and port only, so the payload is never split and may contain the separator.
+        parsed_message = message.split(SocketManager.MESSAGE_SEPARATOR_PATTERN, 2)
+        command = parsed_message[0]
+        if command != MiniCoin.ALIVE:
+            peer_address = "127.0.0.1:%s" % parsed_message[1]
+            with MiniCoin.peers_lock:
+                if peer_address not in MiniCoin.peers \
+                        and len(MiniCoin.peers) < MiniCoin.MAX_CONNECTIONS \
+                        and peer_address != self.address_string:
+                    MiniCoin.peers.append(peer_address)
+        handler = self.__handlers.get(command)
+        if handler is None:
+            return "COMPLETE"
+        response = handler(parsed_message[2] if len(parsed_message) > 2 else "")
+        return "COMPLETE" if response is None else response
+
+    def __handle_new_block(self, payload):
+        """
+        Args:
+            payload(str): A block in the format of str(block).
+        """
+        self.__got_new_block(Block.block_from_string(payload))
+
+    def __handle_new_transaction(self, payload):
+        """
+        Args:
+            payload(str): A transaction in the format of str(transaction).
+        """
+        self._got_new_transaction(Transaction.transaction_from_string(payload))
 
     def start_mining(self, block=None):
         """
@@ -446,12 +726,12 @@ class MiniCoin:
         """
         # Shoot off a thread to mine on, thread will repeat until this function ends on user input.
         MiniCoin.no_new_block = True
-        MiniCoin.active_mining = True
+        MiniCoin.stop_mining.clear()
         time.sleep(.1)
         threading.Thread(target=self.__threaded_miner, args=[block]).start()
         print("Press ENTER to stop mining at any time!")
         input()
-        MiniCoin.active_mining = False
+        MiniCoin.stop_mining.set()
         print("Miner stopping.")
 
     def __threaded_miner(self, block=None):
@@ -465,36 +745,77 @@ class MiniCoin:
             Block:
                 A newly minted block. Returns None if loop is exited without solving the block.
         """
-        # Loop until user input.
-        while MiniCoin.active_mining:
-            random.seed()
-            print("Mining blocks in new thread...")
-            # Generate a new block to test random nonce on.
-            if block is None:
-                MiniCoin.semaphore.acquire()
-                mining_block = Block(MiniCoin.ledger.size(), MiniCoin.mem_pool.get_n_tx(Block.TRANSACTIONS_PER_BLOCK),
-                                     MiniCoin.ledger.get_last_block().block_hash)
-                MiniCoin.semaphore.release()
-            else:
-                mining_block = block
-            MiniCoin.semaphore.acquire()
-            while MiniCoin.no_new_block and MiniCoin.ledger_sync and mining_block.block_id == MiniCoin.ledger.size() \
-                    and MiniCoin.active_mining:
-                MiniCoin.semaphore.release()
-                # While a block has not been found and node considers its ledger up to date, generate a random nonce,
-                # has the mining block and if it conforms to the hash pattern return it, otherwise repeat.
-                random_nonce = random.random()
-                mining_block.nonce = random_nonce
-                block_hash = HashFunctions.hash_input(mining_block)
-                MiniCoin.semaphore.acquire()
-                if block_hash[0:len(self.HASH_PATTERN)] == self.HASH_PATTERN and MiniCoin.no_new_block:
-                    MiniCoin.semaphore.release()
-                    mining_block.block_hash = block_hash
-                    print("\nNew block discovered:\n%s" % str(mining_block))
-                    self.__announce_minted_block(mining_block)
-                    MiniCoin.semaphore.acquire()
-            MiniCoin.semaphore.release()
-            time.sleep(1)
+        # With a single process the search runs on this thread, there is nothing to gain from a pool.
+        processes = MiniCoin.MINING_PROCESSES
+        pool = None
+        if processes > 1:
+            pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+        stop_requested = MiniCoin.stop_mining.is_set
+        try:
+            # Loop until user input.
+            while not stop_requested():
+                print("Mining blocks in new thread...")
+                # Generate a new block to test random nonce on.
+                with MiniCoin.ledger_lock:
+                    epoch = MiniCoin.ledger.get_epoch()
+                    if block is None:
+                        transactions = MiniCoin.mem_pool.get_n_tx(Block.TRANSACTIONS_PER_BLOCK)
+                        mining_block = Block(MiniCoin.ledger.size(), transactions,
+                                             MiniCoin.ledger.get_last_block().block_hash)
+                    else:
+                        mining_block = block
+                        # A supplied block is only worth mining while it would still extend the chain.
+                        if mining_block.block_id != MiniCoin.ledger.size():
+                            epoch = None
+                # Only the nonce changes between attempts, so the rest of the block string is encoded once.
+                prefix, suffix = mining_block.get_encoded_parts()
+                # Nonces are searched in consecutive ranges from a random starting point, each process taking its own
+                # range of a round so no nonce is tried twice.
+                nonce = random.getrandbits(64)
+                # Any change to the ledger advances its epoch, a single atomic read that tells the miner its block is
+                # stale without taking a lock.
+                while MiniCoin.no_new_block and MiniCoin.ledger_sync and MiniCoin.ledger.get_epoch() == epoch \
+                        and not stop_requested():
+                    # While a block has not been found and node considers its ledger up to date, try a round of nonces
+                    # against the mining block and if one conforms to the hash pattern return it, otherwise repeat.
+                    result = MiniCoin.__search_nonce_ranges(pool, prefix, suffix, nonce, processes)
+                    nonce += processes * MiniCoin.MINING_BATCH_SIZE
+                    if result is not None and MiniCoin.no_new_block:
+                        mining_block.nonce, mining_block.block_hash = result
+                        print("\nNew block discovered:\n%s" % str(mining_block))
+                        self.__announce_minted_block(mining_block)
+                MiniCoin.stop_mining.wait(1)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        return None
+
+    @staticmethod
+    def __search_nonce_ranges(pool, prefix, suffix, start, processes):
+        """
+        Searches one round of nonces, a batch of MINING_BATCH_SIZE consecutive nonces per process.
+
+        Args:
+            pool(ProcessPoolExecutor): Pool to search in, or None to search on the calling thread.
+            prefix(bytes): Encoded block string preceding the nonce.
+            suffix(bytes): Encoded block string following the nonce.
+            start(int): The first nonce of the round.
+            processes(int): Number of batches in the round.
+
+        Returns:
+            tuple: A (nonce, hex digest) conforming to the hash pattern, or None if the round found none.
+        """
+        batch_size = MiniCoin.MINING_BATCH_SIZE
+        pattern = MiniCoin.HASH_PATTERN_BYTES
+        if pool is None:
+            return HashFunctions.search_nonces(prefix, suffix, range(start, start + batch_size), pattern)
+        futures = [pool.submit(HashFunctions.search_nonces, prefix, suffix,
+                               range(start + i * batch_size, start + (i + 1) * batch_size), pattern)
+                   for i in range(processes)]
+        for future in futures:
+            result = future.result()
+            if result is not None:
+                return result
         return None
 
     def validate_block(self, block):
@@ -509,19 +830,18 @@ class MiniCoin:
         """
         if MiniCoin.verbose:
             print("\nValidating new block:\n%s" % str(block))
-        MiniCoin.semaphore.acquire()
-        hash_to_validate = block.block_hash
-        current_head_block = MiniCoin.ledger.get_last_block()
+        # The cached summary is a consistent snapshot of the head, so no lock is needed. Block IDs match their
+        # position in the chain, so the head's ID is one less than the ledger size.
+        ledger_size, head_block_hash, _ = MiniCoin.ledger.get_summary()
         # All the following requirements must be met for this block to be a valid head of the current ledger.
-        if MiniCoin.ledger.size() >= 1 and block.block_id == current_head_block.block_id + 1 and \
-                block.previous_block_hash == current_head_block.block_hash and \
-                HashFunctions.hash_input(block) == block.block_hash and \
-                hash_to_validate[0:len(self.HASH_PATTERN)] == self.HASH_PATTERN:
-            MiniCoin.semaphore.release()
-            if MiniCoin.verbose:
-                print("\nNew Block is Acceptable\n")
-            return True
-        MiniCoin.semaphore.release()
+        if ledger_size >= 1 and block.block_id == ledger_size and \
+                block.previous_block_hash == head_block_hash:
+            # Check the pattern against the raw digest, the hex string is only needed to compare with the claimed hash.
+            digest = HashFunctions.hash_input_bytes(block)
+            if digest.startswith(MiniCoin.HASH_PATTERN_BYTES) and digest.hex() == block.block_hash:
+                if MiniCoin.verbose:
+                    print("\nNew Block is Acceptable\n")
+                return True
         # if MiniCoin.verbose:
         #     print("\nNew Block Invalid\n")
         return False
@@ -533,10 +853,13 @@ class MiniCoin:
         Args:
             transaction(Transaction): The new transaction.
         """
-        for connection in MiniCoin.peers:
+        with MiniCoin.peers_lock:
+            peers = MiniCoin.peers.copy()
+        transaction_string = str(transaction)
+        for connection in peers:
             if MiniCoin.verbose:
                 print("\nPropagating New Transaction: %s to peer: %s\n" % (transaction.tx_data, connection))
-            threading.Thread(target=self.send_message, args=(connection, "new transaction", str(transaction))).start()
+            MiniCoin.peer_executor.submit(self.send_message, connection, MiniCoin.NEW_TRANSACTION, transaction_string)
 
     def propagate_block(self, block):
         """
@@ -548,10 +871,13 @@ class MiniCoin:
         Returns:
 
         """
-        for connection in MiniCoin.peers:
+        with MiniCoin.peers_lock:
+            peers = MiniCoin.peers.copy()
+        block_string = str(block)
+        for connection in peers:
             if MiniCoin.verbose:
                 print("\nPropagating block: %s to peer: %s\n" % (str(block.block_id), connection))
-            threading.Thread(target=self.send_message, args=(connection, "new block", str(block))).start()
+            MiniCoin.peer_executor.submit(self.send_message, connection, MiniCoin.NEW_BLOCK, block_string)
 
     def __announce_minted_block(self, block):
         """
@@ -561,21 +887,19 @@ class MiniCoin:
             block(Block): Freshly minted block
         """
         if self.validate_block(block):
-            MiniCoin.semaphore.acquire()
             MiniCoin.no_new_block = False
-            MiniCoin.ledger.add_block(block)
+            with MiniCoin.ledger_lock:
+                MiniCoin.ledger.add_block(block)
+            MiniCoin.mem_pool.purge_confirmed_tx(block.tx)
             time.sleep(1)
             MiniCoin.no_new_block = True
-            MiniCoin.semaphore.release()
             self.propagate_block(block)
 
     def _got_new_transaction(self, transaction):
         """
         A new transaction has been received.
         """
-        MiniCoin.semaphore.acquire()
-        is_new = MiniCoin.mem_pool.add_tx(transaction)
-        MiniCoin.semaphore.release()
+        is_new = MiniCoin.mem_pool.add_tx((transaction,))
         if is_new:
             if MiniCoin.verbose:
                 print("\nNew Transaction Received: %s" % transaction.tx_data)
@@ -593,13 +917,12 @@ class MiniCoin:
         if is_new:
             if MiniCoin.verbose:
                 print("\nNew block received:\n%s" % str(block))
-            MiniCoin.semaphore.acquire()
             MiniCoin.ledger_sync = False
-            MiniCoin.ledger.add_block(block)
+            with MiniCoin.ledger_lock:
+                MiniCoin.ledger.add_block(block)
             MiniCoin.mem_pool.purge_confirmed_tx(block.tx)
             time.sleep(.1)
             MiniCoin.ledger_sync = True
-            MiniCoin.semaphore.release()
             self.propagate_block(block)
 
     def sync_ledger(self):
@@ -611,54 +934,77 @@ class MiniCoin:
         """
         if MiniCoin.verbose:
             print("\nChecking ledger is up to date...\n")
-        future_list = []
-        executor = ThreadPoolExecutor()
-        # Create threads.
-        for address in MiniCoin.peers:
-            future_list.append([executor.submit(self.send_message, address, "check ledger"), address])
-        calls_complete = False
-
-        # Block until all calls complete.
-        while not calls_complete:
-            calls_complete = True
-            for future in future_list:
-                if future[0].done() is False:
-                    calls_complete = False
-
-        # Find node with longest list.
-        longest_chain = [0]
+        future_addresses = {}
+        with MiniCoin.peers_lock:
+            peers = MiniCoin.peers.copy()
+        # Queue a request to each peer.
+        for address in peers:
+            future = MiniCoin.peer_executor.submit(self.send_message, address, MiniCoin.CHECK_LEDGER,
+                                                   timeout=MiniCoin.SYNC_TIMEOUT)
+            future_addresses[future] = address
+
+        # Take the first peer to answer with a longer chain sharing our genesis block rather than waiting on every
+        # peer, a slower peer with a longer chain is picked up by a later sync.
+        current_size, _, genesis_hash = MiniCoin.ledger.get_summary()
         address = None
-        MiniCoin.semaphore.acquire()
-        for future in future_list:
-            return_value = future[0].result()[0]
-            if return_value is not None and return_value != "":
+        try:
+            for future in as_completed(future_addresses, timeout=MiniCoin.SYNC_TIMEOUT):
+                return_value = future.result()
+                if return_value is None or return_value == "" or return_value == "CONNECTION ERROR":
+                    continue
                 result = return_value.split(":")
-                if result[0] != "CONNECTION ERROR" and int(result[0]) > int(longest_chain[0]):
-                    longest_chain = result
-                    address = future[1]
-        current_size = MiniCoin.ledger.size()
-        genesis_hash = MiniCoin.ledger.get_genesis_block().block_hash
-        MiniCoin.semaphore.release()
-        # Check if longest chain is longer than ours and both share same genesis block.
-        if current_size < int(longest_chain[0]) and longest_chain[2] == genesis_hash:
+                if len(result) == 3 and result[0].isdigit() and int(result[0]) > current_size \
+                        and result[2] == genesis_hash:
+                    address = future_addresses[future]
+                    break
+        except FutureTimeoutError:
+            pass
+        for future in future_addresses:
+            future.cancel()
+        if address is not None:
             if MiniCoin.verbose:
                 print("\nLedger is out of sync, requesting update from peer: %s\n" % address)
-            # Request new blockchain and replace ours with it.
-            new_ledger = self.send_message(address, "send ledger")
-            MiniCoin.semaphore.acquire()
+            # Fetch only the blocks we are missing, falling back to replacing our chain with the peer's whole chain
+            # when the missing blocks do not extend our head.
+            missing_blocks = Ledger.ledger_from_string(self.send_message(address, MiniCoin.GET_BLOCKS_FROM,
+                                                                         str(current_size)))
             MiniCoin.ledger_sync = False
-            MiniCoin.ledger.replace_blockchain(Ledger.ledger_from_string(new_ledger))
+            if not self.__append_blocks(missing_blocks):
+                new_ledger = Ledger.ledger_from_string(self.send_message(address, MiniCoin.SEND_LEDGER))
+                with MiniCoin.ledger_lock:
+                    MiniCoin.ledger.replace_blockchain(new_ledger)
             if MiniCoin.verbose:
                 print("New ledger accepted")
-            MiniCoin.semaphore.release()
             time.sleep(1)
-            MiniCoin.semaphore.acquire()
             MiniCoin.ledger_sync = True
-            MiniCoin.semaphore.release()
         else:
             if MiniCoin.verbose:
                 print("\nLedger is up to date!\n")
 
+    def __append_blocks(self, blocks):
+        """
+        Validates and appends blocks fetched from a peer to the head of the ledger, in order, stopping at the first
+        invalid block. Transactions confirmed by appended blocks are purged from the mem pool.
+
+        Args:
+            blocks(list[Block]): Consecutive blocks, the first of which should extend our head.
+
+        Returns:
+            bool: True if at least one block was appended, False if the first block does not extend our head.
+        """
+        appended = []
+        with MiniCoin.ledger_lock:
+            for block in blocks:
+                if not self.validate_block(block):
+                    break
+                MiniCoin.ledger.add_block(block)
+                appended.append(block)
+        if len(appended) == 0:
+            return False
+        for block in appended:
+            MiniCoin.mem_pool.purge_confirmed_tx(block.tx)
+        return True
+
     def check_ledger(self):
         """
         Fields a request from a peer, responding with some information about the state of this nodes ledger.
@@ -668,12 +1014,8 @@ class MiniCoin:
                 current length, the hash of the head block, the hash of the genesis block.
                 Separated by colons.
         """
-        MiniCoin.semaphore.acquire()
-        genesis_hash = MiniCoin.ledger.get_genesis_block().block_hash
-        head_block_hash = MiniCoin.ledger.get_last_block().block_hash
-        blockchain_length = str(MiniCoin.ledger.size())
-        MiniCoin.semaphore.release()
-        return "%s:%s:%s" % (blockchain_length, head_block_hash, genesis_hash)
+        blockchain_length, head_block_hash, genesis_hash = MiniCoin.ledger.get_summary()
+        return "%s:%s:%s" % (str(blockchain_length), head_block_hash, genesis_hash)
 
     def request_ledger(self, target_address_string):
         """
@@ -684,12 +1026,11 @@ class MiniCoin:
 
         """
         MiniCoin.ledger_sync = False
-        response = self.send_message(target_address_string, "send ledger")
+        response = self.send_message(target_address_string, MiniCoin.SEND_LEDGER)
         peer_ledger = Ledger.ledger_from_string(response)
-        MiniCoin.semaphore.acquire()
-        MiniCoin.ledger.replace_blockchain(peer_ledger)
+        with MiniCoin.ledger_lock:
+            MiniCoin.ledger.replace_blockchain(peer_ledger)
         MiniCoin.ledger_sync = True
-        MiniCoin.semaphore.release()
 
     def send_ledger(self):
         """
@@ -697,34 +1038,55 @@ class MiniCoin:
         """
         if MiniCoin.verbose:
             print("\nA peer has requested a copy of our ledger, sending...\n")
-        return str(MiniCoin.ledger)
+        with MiniCoin.ledger_lock:
+            return str(MiniCoin.ledger)
+
+    def send_blocks_from(self, start_height):
+        """
+        Fields a request from a peer for the blocks it is missing.
+
+        Args:
+            start_height(str): ID of the first block the peer is missing.
+
+        Returns:
+            str: The blocks from start_height to our head, in the format of str(ledger).
+        """
+        if MiniCoin.verbose:
+            print("\nA peer has requested blocks from %s, sending...\n" % start_height)
+        # A malformed height is answered with no blocks, which the peer treats as a failed fetch.
+        height = int(start_height) if start_height.isdigit() else MiniCoin.ledger.size()
+        with MiniCoin.ledger_lock:
+            return MiniCoin.ledger.serialize_from(height)
 
     def pretty_print(self):
         """
         Simple function to print the information about this node in a human readable form.
         """
-        MiniCoin.semaphore.acquire()
+        with MiniCoin.peers_lock:
+            peers = MiniCoin.peers.copy()
+        with MiniCoin.ledger_lock:
+            block_chain = MiniCoin.ledger.block_chain.copy()
+        transactions = MiniCoin.mem_pool.get_all_tx()
         print("Node address: %s\n"
               "***Connected Nodes***\n" % self.address_string)
-        for address in MiniCoin.peers:
+        for address in peers:
             print("%s\n" % address)
         print("*****Blockchain*****\n")
-        for block in MiniCoin.ledger.block_chain:
+        for block in block_chain:
             print("%s" % block.to_string())
         print("\n***Mem Pool***\n")
-        for tx in MiniCoin.mem_pool.tx:
+        for tx in transactions:
             print("Transaction: %s\n" % str(tx))
-        MiniCoin.semaphore.release()
 
     def request_peers_print(self):
         """
         Sends a request to all peers asking them to print their details locally.
         """
-        MiniCoin.semaphore.acquire()
-        for address in MiniCoin.peers:
-            self.send_message(address, "pretty print")
+        with MiniCoin.peers_lock:
+            peers = MiniCoin.peers.copy()
+        for address in peers:
+            self.send_message(address, MiniCoin.PRETTY_PRINT)
             time.sleep(1)
-        MiniCoin.semaphore.release()
 
 
 class ClientInterface(MiniCoin):
@@ -782,7 +1144,6 @@ class ClientInterface(MiniCoin):
             x = input("Press ENTER to continue...")
 
     def tx_flood(self):
-        random.seed()
         print("Generating 20 random transactions and announcing them in 3s...")
         time.sleep(3)
         tx_list = []
@@ -812,6 +1173,9 @@ if __name__ == '__main__':
             print("Starting bootstrap server")
             node = BootStrap()
             node.run()
+            # run() returns as soon as the server thread has started, so wait here for Ctrl+C.
+            while True:
+                time.sleep(1)
         elif option_dict["--type"] == "node" and option_dict["--port"] is not None:
             print("Starting node")
             node = MiniCoin(int(option_dict["--port"]))
@@ -824,6 +1188,10 @@ if __name__ == '__main__':
                     node.pretty_print()
                     time.sleep(5)
                     node.request_peers_print()
+            # Once mining is stopped, or if it never ran, the node goes on syncing and serving peers in the background
+            # until shut down. Waiting a second at a time keeps Ctrl+C responsive.
+            while not MiniCoin.shutdown_event.wait(1):
+                pass
         elif option_dict["--type"] == "node-ui" and option_dict["--port"] is not None:
             node = ClientInterface(int(option_dict["--port"]))
             node.start_server()
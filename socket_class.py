@@ -3,9 +3,13 @@ This class is derived from my older code and has been modified to suit this assi
 -Nick Huppert, s3729119
 """
 
+import asyncio
+import select
 import socket
+import struct
 import threading
-from time import sleep
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 
 class SocketManager:
@@ -13,12 +17,28 @@ class SocketManager:
     Warnings:
         Requires implementing classes to define a callback class that implements a
         "got_message(self, address, message)" function.
+
+    Notes:
+        Every message and response is framed as a 4 byte big-endian length followed by the UTF-8 encoded payload, so
+        payloads larger than a single packet arrive whole. Framing lets a connection carry any number of messages, so
+        the server answers frames until the client hangs up and send_message keeps connections open for reuse.
+
+        The server runs on an asyncio event loop in its own thread, so an open but idle connection costs no thread.
+        Callbacks are still called synchronously, on a bounded pool of handler threads.
     """
     DEFAULT_IP = "127.0.0.1"
     MESSAGE_SEPARATOR_PATTERN = "-----"
+    FRAME_HEADER = struct.Struct("!I")
     DEFAULT_PORT = 5000
     DEFAULT_PACKET_SIZE = 4096
     DEFAULT_IDLE_TIMEOUT = 30
+    # Threads available to run callbacks, shared by all connections to a server.
+    MAX_HANDLER_THREADS = 16
+    # Idle connections kept open per remote address, extra connections are closed once their message is answered.
+    MAX_IDLE_CONNECTIONS = 4
+    # Seconds an idle connection may be reused for, well inside the server's idle timeout so the server does not
+    # close it as it is reused.
+    MAX_IDLE_REUSE = DEFAULT_IDLE_TIMEOUT / 2
     run = True
 
     def __init__(self, callback, ip=DEFAULT_IP, port=DEFAULT_PORT, packet_size=DEFAULT_PACKET_SIZE,
@@ -28,90 +48,289 @@ class SocketManager:
         self.__packet_size = packet_size
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         if server:
+            # Allow a restarted node to listen on its port while connections from its last run are in TIME_WAIT.
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.socket.bind((self.__host_ip, self.__host_port))
         self.__timeout = timeout
         self.callback = callback
+        # Idle outgoing connections keyed by (ip, port), each held with the time it was last used. A connection is
+        # taken out of the pool while in use, so no two threads ever share one.
+        self.__idle_connections = {}
+        self.__pool_lock = threading.Lock()
+        self.__loop = None
+        self.__stopped = None
+        self.__handler_executor = None
+        # Open connections to the server, each connection's handler task mapped to its writer.
+        self.__connections = {}
 
     def listen(self):
         """
         Starts the socket server listening for connections in new thread.
-        Each connection is dispatched to a new thread.
+        Connections are served by an event loop on that thread, each message is passed to the callback on a handler
+        thread.
         """
         SocketManager.run = True
-        self.socket.listen()
-        threading.Thread(target=self.__listen_loop).start()
+        self.__handler_executor = ThreadPoolExecutor(max_workers=SocketManager.MAX_HANDLER_THREADS,
+                                                     thread_name_prefix="handler")
+        started = threading.Event()
+        threading.Thread(target=asyncio.run, args=(self.__serve(started),)).start()
+        started.wait()
         print("Now listening on port: %s" % self.__host_port)
 
-    def __listen_loop(self):
+    async def __serve(self, started):
+        """
+        Serves connections on the bound socket until stop_server is called.
+
+        Args:
+            started(threading.Event): Set once the server is accepting connections.
+        """
+        self.__loop = asyncio.get_running_loop()
+        self.__stopped = asyncio.Event()
         try:
-            while SocketManager.run is True:
-                self.socket.settimeout(self.__timeout)
-                try:
-                    client, address = self.socket.accept()
-                    client.settimeout(self.__timeout)
-                    threading.Thread(target=self.__server_action, args=(client, address)).start()
-                except socket.timeout:
-                    pass
-        except threading.ThreadError:
-            pass
+            server = await asyncio.start_server(self.__server_action, sock=self.socket)
         finally:
-            self.socket.close()
+            started.set()
+        async with server:
+            await self.__stopped.wait()
+            # Close open connections so their handlers finish rather than being cancelled when the loop ends.
+            for writer in self.__connections.values():
+                writer.close()
+            await asyncio.gather(*self.__connections, return_exceptions=True)
+        self.__handler_executor.shutdown(wait=False)
+
+    @staticmethod
+    def __set_low_latency(connection):
+        """
+        Messages are small and sent as a single request/response, so disable Nagle's algorithm and, where the
+        platform supports it, delayed acknowledgements to stop either from holding a reply back.
+
+        Args:
+            connection: The connected socket to configure.
+        """
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if hasattr(socket, "TCP_QUICKACK"):
+            try:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+            except OSError:
+                pass
+
+    @staticmethod
+    def encode_frame(message):
+        """
+        Args:
+            message(str): The message to frame.
+
+        Returns:
+            bytes: The encoded message preceded by its length.
+        """
+        payload = message.encode()
+        return SocketManager.FRAME_HEADER.pack(len(payload)) + payload
+
+    def __receive_exactly(self, connection, size):
+        """
+        Reads exactly size bytes from a connection.
+
+        Returns:
+            bytes: The bytes read, or None if the connection closed first.
+        """
+        buffer = bytearray()
+        while len(buffer) < size:
+            chunk = connection.recv(min(size - len(buffer), self.__packet_size))
+            if chunk == b'':
+                return None
+            buffer += chunk
+        return bytes(buffer)
+
+    def __receive_frame(self, connection):
+        """
+        Reads one length prefixed frame from a connection.
+
+        Returns:
+            str: The decoded payload, or None if the connection closed before a whole frame arrived.
+        """
+        header = self.__receive_exactly(connection, SocketManager.FRAME_HEADER.size)
+        if header is None:
+            return None
+        payload = self.__receive_exactly(connection, SocketManager.FRAME_HEADER.unpack(header)[0])
+        if payload is None:
+            return None
+        return payload.decode()
 
     # Parse the message received from a client and call appropriate function
-    def __server_action(self, client, address):
+    async def __server_action(self, reader, writer):
         """
+        Answers framed messages on one connection until the client hangs up or leaves it idle past the timeout.
+
         Args:
-            client: The client who has connected to the server
-            address: The address of the client
+            reader(asyncio.StreamReader): Stream of messages from the client.
+            writer(asyncio.StreamWriter): Stream of responses to the client.
         """
-        response = ""
+        address = writer.get_extra_info("peername")
+        SocketManager.__set_low_latency(writer.get_extra_info("socket"))
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self.__connections[task] = writer
         try:
-            with client:
-                while True:
-                    message = client.recv(self.__packet_size)
-                    if message == b'':
-                        break
-                    if message is not None:
-                        response = str(self.callback.got_message(address, message.decode()))
-                        client.sendall(response.encode())
-                        break
-                    else:
-                        break
-
-        except (TimeoutError, AttributeError, socket.timeout, ConnectionError, ConnectionRefusedError) as e:
+            while SocketManager.run is True:
+                try:
+                    header = await asyncio.wait_for(reader.readexactly(SocketManager.FRAME_HEADER.size),
+                                                    self.__timeout)
+                    payload = await asyncio.wait_for(reader.readexactly(SocketManager.FRAME_HEADER.unpack(header)[0]),
+                                                     self.__timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                try:
+                    response = await loop.run_in_executor(self.__handler_executor, self.callback.got_message,
+                                                          address, payload.decode())
+                except Exception as e:
+                    # A failed message gets an empty reply rather than costing the client its connection.
+                    print("Error handling message from %s: %r" % (address, e))
+                    response = ""
+                writer.write(SocketManager.encode_frame(str(response)))
+                await writer.drain()
+
+        except (AttributeError, ConnectionError) as e:
             print("%s" % e)
         finally:
-            client.close()
+            del self.__connections[task]
+            writer.close()
 
-    def send_message(self, ip, port, message):
+    def send_message(self, ip, port, message, timeout=None):
         """
         Takes a string message and sends it to remote server, returning the response.
+        An idle connection to the server is reused when one is available, otherwise a new connection is made.
 
         Args:
             ip(str): IP address to connect to as string.
             port(int): Port number to connect to.
             message(str): The message to send, encrypted, to the remote server.
+            timeout(float): Seconds to wait on the connection before giving up, defaults to the idle timeout.
 
         Returns:
-            str: The response of the server or None on error.
+            str: The response of the server, "" if it hung up without replying or "CONNECTION ERROR" on error.
          """
+        key = (ip, int(port))
+        frame = SocketManager.encode_frame(message)
+        timeout = self.__timeout if timeout is None else timeout
+        socket_connection = self.__take_connection(key)
+        if socket_connection is not None:
+            try:
+                socket_connection.settimeout(timeout)
+                socket_connection.sendall(frame)
+            except ConnectionError:
+                # The frame was not delivered, so it is safe to send again on a new connection. Once a frame has been
+                # sent it is never resent, as the server may already have acted on it.
+                socket_connection.close()
+            except (AttributeError, socket.timeout):
+                socket_connection.close()
+                return "CONNECTION ERROR"
+            else:
+                return self.__receive_response(key, socket_connection)
         socket_connection = None
         try:
             socket_connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            response = None
-            socket_connection.connect((ip, int(port)))
-            socket_connection.sendall(message.encode())
-            sleep(.1)
-            while response is None:
-                response = socket_connection.recv(self.__packet_size)
-            socket_connection.close()
-            return response.decode()
+            socket_connection.settimeout(timeout)
+            SocketManager.__set_low_latency(socket_connection)
+            socket_connection.connect(key)
+            socket_connection.sendall(frame)
         except (ConnectionRefusedError, AttributeError, socket.timeout, ConnectionError) as e:
             # print("%s" % e)
-            return_value = "CONNECTION ERROR"
-        finally:
-            socket_connection.close()
-        return return_value
+            if socket_connection is not None:
+                socket_connection.close()
+            return "CONNECTION ERROR"
+        return self.__receive_response(key, socket_connection)
+
+    def __receive_response(self, key, connection):
+        """
+        Reads the reply to a sent frame, returning the connection to the idle pool once it has been answered.
+
+        Args:
+            key(tuple): The (ip, port) of the server.
+            connection(socket.socket): The connection the frame was sent on.
+
+        Returns:
+            str: The response of the server, "" if it hung up without replying or "CONNECTION ERROR" on error.
+        """
+        try:
+            response = self.__receive_frame(connection)
+        except (socket.timeout, ConnectionError):
+            connection.close()
+            return "CONNECTION ERROR"
+        if response is None:
+            # A peer that hangs up without replying is treated as an empty response.
+            connection.close()
+            return ""
+        self.__release_connection(key, connection)
+        return response
+
+    def __take_connection(self, key):
+        """
+        Returns:
+            socket.socket: An idle connection to the given address, or None if there are none.
+        """
+        stale = []
+        connection = None
+        with self.__pool_lock:
+            connections = self.__idle_connections.get(key)
+            while connections:
+                connection, last_used = connections.pop()
+                if time.monotonic() - last_used > SocketManager.MAX_IDLE_REUSE:
+                    # Connections are pooled in the order they were released, so the rest are older still.
+                    stale.append(connection)
+                    stale.extend(connection for connection, _ in connections)
+                    connections.clear()
+                    connection = None
+                elif SocketManager.__is_readable(connection):
+                    # Nothing is owed on an idle connection, so anything to read means the server closed it.
+                    stale.append(connection)
+                    connection = None
+                else:
+                    break
+        for stale_connection in stale:
+            stale_connection.close()
+        return connection
+
+    @staticmethod
+    def __is_readable(connection):
+        """
+        Returns:
+            bool: True if the connection has data or end of stream waiting to be read.
+        """
+        try:
+            return bool(select.select([connection], [], [], 0)[0])
+        except (OSError, ValueError):
+            return True
+
+    def __release_connection(self, key, connection):
+        """
+        Returns a connection to the idle pool once its exchange has completed, closing it if the pool is full.
+        """
+        with self.__pool_lock:
+            connections = self.__idle_connections.setdefault(key, [])
+            if len(connections) < SocketManager.MAX_IDLE_CONNECTIONS:
+                connections.append((connection, time.monotonic()))
+                return
+        connection.close()
+
+    def close_connections(self, ip=None, port=None):
+        """
+        Closes idle outgoing connections to one address, or to every address if none is given.
+
+        Args:
+            ip(str): IP address of the remote server.
+            port(int): Port number of the remote server.
+        """
+        with self.__pool_lock:
+            if ip is None:
+                connections = [connection for idle in self.__idle_connections.values() for connection, _ in idle]
+                self.__idle_connections.clear()
+            else:
+                connections = [connection for connection, _ in self.__idle_connections.pop((ip, int(port)), [])]
+        for connection in connections:
+            connection.close()
 
     def stop_server(self):
         SocketManager.run = False
+        if self.__loop is not None:
+            self.__loop.call_soon_threadsafe(self.__stopped.set)
+        self.close_connections()
@@ -0,0 +1,23 @@
+import unittest
+
+from minicoin import Ledger
+
+
+class LedgerFromStringTest(unittest.TestCase):
+    def setUp(self):
+        self.serialized = str(Ledger())
+
+    def test_round_trip(self):
+        blocks = Ledger.ledger_from_string(self.serialized)
+        self.assertEqual([block.block_hash for block in blocks], [Ledger().get_last_block().block_hash])
+
+    def test_truncated_ledger_is_empty(self):
+        self.assertEqual(Ledger.ledger_from_string(self.serialized[:-1]), [])
+
+    def test_malformed_block_is_empty(self):
+        for body in ("1", "1\nnot a nonce\nhash", "1\n5\nhash\nno separator"):
+            self.assertEqual(Ledger.ledger_from_string(self.serialized + "%d:%s" % (len(body), body)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+
+from minicoin import MemPool, Transaction
+
+
+def make_transaction(number):
+    return Transaction("%064x" % number, "Random Transaction #%d" % number)
+
+
+class MemPoolSeenTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(MemPool, "SEEN_MAX", 4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mem_pool = MemPool()
+        self.pooled = make_transaction(0)
+        self.mem_pool.add_tx((self.pooled,))
+        # Confirming unseen transactions fills the seen set until the pooled transaction ages out of it.
+        self.mem_pool.purge_confirmed_tx([make_transaction(number) for number in range(1, 6)])
+
+    def test_pooled_transaction_is_not_new_after_aging_out_of_seen(self):
+        self.assertFalse(self.mem_pool.add_tx((self.pooled,)))
+        self.assertEqual(self.mem_pool.get_all_tx(), [self.pooled])
+
+    def test_sample_holds_each_pooled_transaction_once(self):
+        self.mem_pool.add_tx((self.pooled,))
+        self.assertEqual(self.mem_pool.get_n_tx(10), [self.pooled])
+        self.assertEqual(len(self.mem_pool._MemPool__transactions), len(self.mem_pool.tx))
+        self.mem_pool.purge_confirmed_tx((self.pooled,))
+        self.assertEqual(self.mem_pool.get_n_tx(10), [])
+
+
+class MemPoolSampleTest(unittest.TestCase):
+    def assert_sample_matches_pool(self, mem_pool):
+        transactions = mem_pool._MemPool__transactions
+        positions = mem_pool._MemPool__positions
+        self.assertEqual(len(transactions), len(mem_pool.tx))
+        self.assertEqual(set(transactions), set(mem_pool.tx.values()))
+        for tx_id, position in positions.items():
+            self.assertEqual(transactions[position].tx_id, tx_id)
+
+    def test_sample_follows_eviction_and_purge(self):
+        with mock.patch.object(MemPool, "MEMPOOL_MAX", 10):
+            mem_pool = MemPool()
+            transactions = [make_transaction(number) for number in range(30)]
+            mem_pool.add_tx(transactions)
+            self.assertEqual(set(mem_pool.get_all_tx()), set(transactions[20:]))
+            self.assert_sample_matches_pool(mem_pool)
+            mem_pool.purge_confirmed_tx(transactions[15:25])
+            self.assert_sample_matches_pool(mem_pool)
+            sample = mem_pool.get_n_tx(3)
+            self.assertEqual(len(set(sample)), 3)
+            self.assertTrue(all(transaction.tx_id in mem_pool.tx for transaction in sample))
+
+
+if __name__ == '__main__':
+    unittest.main()